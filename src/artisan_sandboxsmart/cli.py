@@ -1,11 +1,17 @@
 import argparse
 import asyncio
+import json
 import logging
-import threading
+from typing import Optional
 
+import aioconsole
 from bleak import BleakScanner
 
-from artisan_sandboxsmart.config import configure_logging
+from artisan_sandboxsmart.config import (
+    CACHED_CONNECT_TIMEOUT,
+    LAST_DEVICE_FILE,
+    configure_logging,
+)
 from artisan_sandboxsmart.controller import RoasterController
 
 logger = logging.getLogger(__name__)
@@ -13,9 +19,9 @@ logger = logging.getLogger(__name__)
 class RoasterCLI:
     def __init__(self, controller: RoasterController):
         self.controller = controller
-        self.menu_thread = None
+        self.menu_task: Optional[asyncio.Task] = None
 
-    def print_menu(self) -> str:
+    async def print_menu(self) -> str:
         menu = """---MENU---
         Heat power: HEAT 0-100
         Drum speed: DRUM 0-100
@@ -31,57 +37,97 @@ class RoasterCLI:
         Exit: EXIT
         """
         print(menu)
-        return input("Enter your choice: ")
+        return await aioconsole.ainput("Enter your choice: ")
 
-    def menu_thread_func(self):
-        """Thread pour gérer le menu et les entrées utilisateur"""
+    async def menu_loop(self):
+        """Gère le menu et les entrées utilisateur sans bloquer la boucle d'événements"""
         while self.controller.running:
             try:
-                choice = self.print_menu()
+                choice = await self.print_menu()
                 self.controller.add_command(choice)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"Error in menu thread: {e}")
+                logger.error(f"Error in menu loop: {e}")
 
     def start_menu(self):
-        """Démarre le thread du menu"""
-        self.menu_thread = threading.Thread(target=self.menu_thread_func)
-        self.menu_thread.start()
+        """Démarre la tâche du menu"""
+        self.menu_task = asyncio.create_task(self.menu_loop())
 
-    def stop_menu(self):
-        """Arrête le thread du menu"""
-        if self.menu_thread and self.menu_thread.is_alive():
-            self.menu_thread.join()
+    async def stop_menu(self):
+        """Arrête la tâche du menu"""
+        if self.menu_task and not self.menu_task.done():
+            self.menu_task.cancel()
+            try:
+                await self.menu_task
+            except asyncio.CancelledError:
+                pass
 
-async def main(args: argparse.Namespace):
+def load_last_device(path: str = LAST_DEVICE_FILE) -> Optional[dict]:
+    """Lit le dernier périphérique connecté avec succès"""
+    try:
+        with open(path) as f:
+            last_device = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Fichier écrit à la main ou par une autre version : on retombe sur le scan
+    if not isinstance(last_device, dict) or not isinstance(last_device.get("address"), str):
+        return None
+    return last_device
+
+def save_last_device(name: Optional[str], address: str, path: str = LAST_DEVICE_FILE):
+    """Mémorise le périphérique connecté pour les prochains lancements"""
+    try:
+        with open(path, "w") as f:
+            json.dump({"name": name, "address": address}, f)
+    except OSError as e:
+        logger.warning(f"Could not save last device: {e}")
+
+async def find_device(args: argparse.Namespace):
+    """Recherche le périphérique par adresse ou par nom"""
     logger.info("starting scan...")
 
-    device = None
     if args.address:
-        device = await BleakScanner.find_device_by_address(
+        return await BleakScanner.find_device_by_address(
             args.address,
             cb=dict(use_bdaddr=args.macos_use_bdaddr)
         )
-    else:
-        device = await BleakScanner.find_device_by_name(
-            args.name,
-            cb=dict(use_bdaddr=args.macos_use_bdaddr)
-        )
-
-    if device is None:
-        logger.error("Could not find device")
-        return
+    return await BleakScanner.find_device_by_name(
+        args.name,
+        cb=dict(use_bdaddr=args.macos_use_bdaddr)
+    )
 
+async def main(args: argparse.Namespace):
     controller = RoasterController()
     cli = RoasterCLI(controller)
 
     try:
-        # Connexion au périphérique
-        connected = await controller.connect(device)
+        # Connexion directe au dernier périphérique connu, sans scan
+        connected = False
+        last_device = load_last_device()
+        if last_device and (
+            (args.address and last_device.get("address") == args.address)
+            or (args.name and last_device.get("name") == args.name)
+        ):
+            logger.info(f"Connecting to last known device {last_device['address']}")
+            connected = await controller.connect(
+                last_device["address"], timeout=CACHED_CONNECT_TIMEOUT
+            )
+
+        # Sinon, scan puis connexion
         if not connected:
-            logger.error("Failed to connect to device")
-            return
-
-        # Démarrage du thread du menu
+            device = await find_device(args)
+            if device is None:
+                logger.error("Could not find device")
+                return
+
+            connected = await controller.connect(device)
+            if not connected:
+                logger.error("Failed to connect to device")
+                return
+            save_last_device(device.name or args.name, device.address)
+
+        # Démarrage du menu
         cli.start_menu()
 
         # Démarrage du processeur de commandes
@@ -93,7 +139,7 @@ async def main(args: argparse.Namespace):
     finally:
         # Nettoyage
         await controller.disconnect()
-        cli.stop_menu()
+        await cli.stop_menu()
 
 def cli_main():
     parser = argparse.ArgumentParser()
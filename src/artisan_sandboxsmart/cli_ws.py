@@ -1,8 +1,9 @@
 import asyncio
-import json
 import argparse
 import logging
 
+import aioconsole
+import orjson
 import websockets
 
 from artisan_sandboxsmart.config import configure_logging
@@ -13,7 +14,7 @@ class WebSocketRoasterCLI:
     def __init__(self, websocket_url):
         self.websocket_url = websocket_url
 
-    def print_menu(self) -> str:
+    async def print_menu(self) -> str:
         menu = """---MENU---
         Heat power: HEAT 0-100
         Drum speed: DRUM 0-100
@@ -29,25 +30,48 @@ class WebSocketRoasterCLI:
         Exit: EXIT
         """
         print(menu)
-        return input("Enter your choice: ")
+        return await aioconsole.ainput("Enter your choice: ")
 
-    async def run(self):
+    async def _reader(self, websocket):
+        """Affiche les réponses du serveur dès leur arrivée"""
         try:
-            async with websockets.connect(self.websocket_url, logger=logging.getLogger("websockets.client"), ping_timeout=None, ping_interval=10) as websocket:
-                while True:
-                    try:
-                        choice = self.print_menu()
-                        
-                        if choice.upper() == 'EXIT':
-                            break
+            async for response in websocket:
+                try:
+                    print("Server response:", orjson.loads(response))
+                except orjson.JSONDecodeError as e:
+                    # Une trame illisible ne doit pas arrêter la réception
+                    logger.error(f"Invalid server response {response!r}: {e}")
+        except websockets.exceptions.ConnectionClosedError as e:
+            logger.error(f"Connection closed: {e}")
+
+    async def _writer(self, websocket):
+        """Envoie les commandes saisies, sans bloquer la réception"""
+        while True:
+            try:
+                choice = await self.print_menu()
+
+                if choice.upper() == 'EXIT':
+                    break
 
-                        await websocket.send(json.dumps({"pushMessage": choice}))
-                        
-                        response = await asyncio.wait_for(websocket.recv(), timeout=300)
-                        print("Server response:", json.loads(response))
+                await websocket.send(orjson.dumps({"pushMessage": choice}))
 
-                    except Exception as e:
-                        logger.error(f"Error processing command: {e}")
+            except websockets.exceptions.ConnectionClosed:
+                break
+            except Exception as e:
+                logger.error(f"Error processing command: {e}")
+
+    async def run(self):
+        try:
+            async with websockets.connect(self.websocket_url, logger=logging.getLogger("websockets.client"), ping_timeout=None, ping_interval=10) as websocket:
+                # S'arrête dès que l'utilisateur quitte ou que le serveur ferme la connexion
+                tasks = [
+                    asyncio.create_task(self._reader(websocket)),
+                    asyncio.create_task(self._writer(websocket)),
+                ]
+                _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
 
         except websockets.exceptions.ConnectionRefusedError:
             logger.error("Could not connect to WebSocket server")
@@ -4,13 +4,18 @@ Centralizes UUIDs, constants, and logging configuration.
 """
 
 import logging
+import os
 
 # BLE UUIDs for Sandbox Smart roaster communication
 NOTIFY_UUID = "0000ffa1-0000-1000-8000-00805f9b34fb"
 ROASTER_CHARACTERISTIC_UUID = "0000ffa0-0000-1000-8000-00805f9b34fb"
 
+# Last successfully connected device, tried before scanning
+LAST_DEVICE_FILE = os.path.join(os.path.expanduser("~"), ".artisan_sandboxsmart_last.json")
+CACHED_CONNECT_TIMEOUT = 3.0
+
 # Command constants
-HSTOP = bytearray([0x48, 0x53, 0x54, 0x4F, 0x50])
+HSTOP = b"HSTOP"
 
 # Logging configuration defaults
 DEFAULT_LOG_LEVEL = logging.INFO
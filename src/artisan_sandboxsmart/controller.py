@@ -1,7 +1,11 @@
 import asyncio
+import functools
 import logging
+import re
+import struct
+import sys
 import time
-from typing import Optional, Dict
+from typing import Optional
 from bleak import BleakClient
 from bleak.backends.characteristic import BleakGATTCharacteristic
 
@@ -9,7 +13,45 @@ from artisan_sandboxsmart.config import NOTIFY_UUID, ROASTER_CHARACTERISTIC_UUID
 
 logger = logging.getLogger(__name__)
 
+_HAS_DIGIT = re.compile(r'\d').search
+_IS_INTEGER = re.compile(r'-?\d+').fullmatch
+
+def _encode_u8(parameter: str, value: str) -> bytes:
+    """PARAM suivi d'une valeur sur 1 octet (0-100), ignorée hors limites"""
+    value_int = int(value)
+    if 0 <= value_int <= 100:
+        return parameter.encode('ascii') + bytes((value_int,))
+    return parameter.encode('ascii')
+
+def _encode_u16(parameter: str, values: tuple) -> bytes:
+    """PARAM suivi de valeurs sur 2 octets big-endian"""
+    return parameter.encode('ascii') + struct.pack(f'>{len(values)}H', *map(int, values))
+
+def _encode_text(parameter: str, value: str) -> bytes:
+    """PARAM suivi d'un argument texte, ex. 'LIGHT ON'"""
+    return f"{parameter} {value}".encode('ascii')
+
+@functools.lru_cache(maxsize=256)
+def _encode_command(parameter: str, values: tuple) -> bytes:
+    """Encode une commande ; le jeu de commandes est réduit, le résultat est mis en cache"""
+    if not values:
+        return parameter.encode('ascii')
+    if len(values) > 1:
+        return _encode_u16(parameter, values)
+    value = values[0]
+    if isinstance(value, int) or _IS_INTEGER(value):
+        return _encode_u8(parameter, value)
+    return _encode_text(parameter, value)
+
 class RoasterController:
+    # Préfixe de trame (2 octets ASCII en big-endian) -> (offset de la température, sonde BT ?)
+    _PREFIX_HANDLERS = {
+        0x5054: (4, False),  # 'PT' Preheating phase
+        0x4354: (4, True),   # 'CT' Roasting phase
+        0x434C: (4, False),  # 'CL' Cooling phase
+        0x4854: (2, False),  # 'HT'
+    }
+
     def __init__(self):
         self.client: Optional[BleakClient] = None
         self.command_queue = asyncio.Queue()
@@ -19,17 +61,36 @@ class RoasterController:
         self.bean_temperature: Optional[float] = None
         self.et_ror: Optional[float] = None
         self.bt_ror: Optional[float] = None
+        # Incrémenté à chaque changement de ET/BT ou de leur RoR
+        self.temperature_version = 0
         self._last_et: Optional[float] = None
         self._last_bt: Optional[float] = None
         self._last_et_time: Optional[float] = None
         self._last_bt_time: Optional[float] = None
-        self.latest_data: Dict = {}
+        self._latest_raw: Optional[bytes] = None
         self.preheat_target: Optional[int] = None
         self.preheat_done = asyncio.Event()
         self._preheat_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._rx_queue = asyncio.Queue()
+        self._rx_task: Optional[asyncio.Task] = None
+        self._processor_task: Optional[asyncio.Task] = None
+        self._connection_parameters_request = None
+        self._write_char: Optional[BleakGATTCharacteristic] = None
+        self._mtu: Optional[int] = None
+
+    @property
+    def latest_data(self):
+        """Dernière notification non reconnue, décodée en texte à la lecture si possible"""
+        if self._latest_raw is None:
+            return {}
+        try:
+            return self._latest_raw.decode("utf-8")
+        except UnicodeDecodeError:
+            return self._latest_raw
 
     def has_numbers(self, inputString: str) -> bool:
-        return any(char.isdigit() for char in inputString)
+        return _HAS_DIGIT(inputString) is not None
 
     def _compute_ror(self, current_temp: float, last_temp: Optional[float], last_time: Optional[float], now: float) -> Optional[float]:
         """Calcule le Rate of Rise en °/min"""
@@ -42,106 +103,146 @@ class RoasterController:
 
     def update_temperatures(self, data: bytearray) -> Optional[float]:
         """Met a jour les températures depuis les données reçues"""
-        try:
-            hex_temp = data.hex()
-            now = time.monotonic()
-            logger.debug(f"hex_temp {hex_temp}")
-            logger.debug(f"self {self.__dict__}")
-            if hex_temp.startswith('5054'):  # Preheating phase 'PT'
-                temp_bytes = hex_temp[8:12]
-                temp = int(temp_bytes, 16)
-                if temp > 0:
-                    ror = self._compute_ror(temp, self._last_et, self._last_et_time, now)
-                    if ror is not None:
-                        self.et_ror = ror
-                    self._last_et = temp
-                    self._last_et_time = now
-                    self.environment_temperature = temp
-                logger.debug(f"Temp_bytes: {temp_bytes}, int(temp_bytes, 16): {temp}")
-                if self.preheat_target and self.environment_temperature >= self.preheat_target:
-                    self.preheat_done.set()
-                return temp
-            elif hex_temp.startswith('4354'):  # Roasting phase 'CT'
-                temp_bytes = hex_temp[8:12]
-                temp = int(temp_bytes, 16)
-                if temp > 0:
-                    ror = self._compute_ror(temp, self._last_bt, self._last_bt_time, now)
-                    if ror is not None:
-                        self.bt_ror = ror
-                    self._last_bt = temp
-                    self._last_bt_time = now
-                    self.bean_temperature = temp
-                logger.debug(f"Temp_bytes: {temp_bytes}, int(temp_bytes, 16): {temp}")
-                return temp
-            elif hex_temp.startswith('434c'):  # Cooling phase 'CL'
-                temp_bytes = hex_temp[8:12]
-                temp = int(temp_bytes, 16)
-                if temp > 0:
-                    ror = self._compute_ror(temp, self._last_et, self._last_et_time, now)
-                    if ror is not None:
-                        self.et_ror = ror
-                    self._last_et = temp
-                    self._last_et_time = now
-                    self.environment_temperature = temp
-                logger.debug(f"Temp_bytes: {temp_bytes}, int(temp_bytes, 16): {temp}")
-                return temp
-            elif hex_temp.startswith('4854'):  # 'HT' en hex
-                temp_bytes = hex_temp[4:8]
-                temp = int(temp_bytes, 16)
-                if temp > 0:
-                    ror = self._compute_ror(temp, self._last_et, self._last_et_time, now)
-                    if ror is not None:
-                        self.et_ror = ror
-                    self._last_et = temp
-                    self._last_et_time = now
-                    self.environment_temperature = temp
-                logger.debug(f"Temp_bytes: {temp_bytes}, int(temp_bytes, 16): {temp}")
-                return temp
-        except Exception as e:
-            logger.error(f"Error parsing temperature: {e}")
-        return None
-
-    async def send_command(self, parameter: str, *values):
-        """Envoie des commandes au format 'PARAM', 'PARAM VALUE' ou 'PARAM VALUE1 VALUE2' en hexadécimal au client bluetooth"""
-        command = parameter.encode('ascii')
+        if len(data) < 4:
+            return None
+        prefix = (data[0] << 8) | data[1]
+        handler = self._PREFIX_HANDLERS.get(prefix)
+        if handler is None:
+            return None
+        offset, is_bean = handler
+        if len(data) < offset + 2:
+            return None
+        now = time.monotonic()
+        temp = int.from_bytes(data[offset:offset + 2], 'big')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("self %s", self.__dict__)
+            logger.debug("Temp_bytes: %s, temp: %d", data[offset:offset + 2].hex(), temp)
+        if temp > 0:
+            if is_bean:
+                ror = self._compute_ror(temp, self._last_bt, self._last_bt_time, now)
+                if temp != self.bean_temperature or (ror is not None and ror != self.bt_ror):
+                    self.temperature_version += 1
+                if ror is not None:
+                    self.bt_ror = ror
+                self._last_bt = temp
+                self._last_bt_time = now
+                self.bean_temperature = temp
+            else:
+                ror = self._compute_ror(temp, self._last_et, self._last_et_time, now)
+                if temp != self.environment_temperature or (ror is not None and ror != self.et_ror):
+                    self.temperature_version += 1
+                if ror is not None:
+                    self.et_ror = ror
+                self._last_et = temp
+                self._last_et_time = now
+                self.environment_temperature = temp
+        if (
+            prefix == 0x5054
+            and self.preheat_target
+            and self.environment_temperature is not None
+            and self.environment_temperature >= self.preheat_target
+        ):
+            self.preheat_done.set()
+        return temp
 
-        logger.info(f"send_command: {command}: {values}")
+    def build_command(self, parameter: str, *values) -> bytes:
+        """Encode une commande 'PARAM', 'PARAM VALUE' ou 'PARAM VALUE1 VALUE2' au format attendu par le torréfacteur"""
+        logger.info("send_command: %s: %s", parameter, values)
 
-        
+        actual_values = ()
         if values and values[0]:
             actual_values = values[0] if isinstance(values[0], tuple) else values
+        return _encode_command(parameter, tuple(actual_values))
 
-            if len(actual_values) == 1:
-                try:
-                    if 0 <= int(actual_values[0]) <= 100:
-                        value_int = int(actual_values[0])
-                        command += bytes([value_int])
-                except ValueError:
-                    command += ' '
-                    command += actual_values[0].encode('ascii')
-            else:
-                for value in actual_values:
-                    value_int = int(value)
-                    command += value_int.to_bytes(2, byteorder='big')
-        
-        logger.info(f"Command hex: {command.hex()}")
+    def encode_command(self, command) -> Optional[bytes]:
+        """Retourne la trame à écrire pour une commande de la queue, ou None pour une commande de contrôle"""
+        if isinstance(command, (bytes, bytearray)):
+            return bytes(command)
+        if isinstance(command, tuple) or command == "PREHEAT_STOP":
+            return None
+        if self.has_numbers(command):
+            return self.build_command(*command.split())
+        return self.build_command(command)
+
+    async def _write(self, payload: bytes):
+        """Écrit une trame sur la caractéristique du torréfacteur"""
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Command hex: %s", payload.hex())
+        if self._mtu and len(payload) > self._mtu - 3:
+            logger.warning("Command of %d bytes exceeds the MTU payload (%d bytes)", len(payload), self._mtu - 3)
         await self.client.write_gatt_char(
-            ROASTER_CHARACTERISTIC_UUID,
-            command,
+            self._write_char or ROASTER_CHARACTERISTIC_UUID,
+            payload,
             response=False
         )
 
+    async def send_command(self, parameter: str, *values):
+        """Envoie des commandes au format 'PARAM', 'PARAM VALUE' ou 'PARAM VALUE1 VALUE2' en hexadécimal au client bluetooth"""
+        await self._write(self.build_command(parameter, *values))
+
+    async def _write_all(self, payloads):
+        """Enchaîne les écritures ; un échec n'annule pas les autres"""
+        results = await asyncio.gather(*(self._write(p) for p in payloads), return_exceptions=True)
+        for payload, result in zip(payloads, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error writing command {payload!r}: {result}")
+
+    async def send_batch(self, commands):
+        """Envoie un lot de commandes en enchaînant les écritures sans attendre chacune d'elles"""
+        if not (self.client and self.client.is_connected):
+            return
+        pending = []
+        for command in commands:
+            try:
+                payload = self.encode_command(command)
+            except Exception as e:
+                # Une commande invalide ne doit pas faire perdre le reste du lot (ex. HSTOP)
+                logger.error(f"Invalid command {command!r}: {e}")
+                continue
+            if payload is not None:
+                pending.append(payload)
+                continue
+            # Commande de contrôle : vider les écritures en attente pour conserver l'ordre
+            if pending:
+                await self._write_all(pending)
+                pending = []
+            try:
+                await self.process_command(command)
+            except Exception as e:
+                logger.error(f"Error processing command {command!r}: {e}")
+        if pending:
+            await self._write_all(pending)
+
     async def notification_handler(self, characteristic: BleakGATTCharacteristic, data: bytearray):
-        """Gestionnaire de notifications BLE"""
-        temp = self.update_temperatures(data)
-        if temp is not None:
-            logger.info(f"Temperatures updated: ET: {self.environment_temperature} BT: {self.bean_temperature}")
-        else:
+        """Gestionnaire de notifications BLE, délègue le décodage à _rx_processor"""
+        self._put_threadsafe(self._rx_queue, bytes(data))
+
+    async def _rx_processor(self):
+        """Traite les notifications BLE depuis la queue de réception, par lots"""
+        while self.running:
             try:
-                self.latest_data = data.decode("utf-8")
+                batch = [await self._rx_queue.get()]
+                while True:
+                    try:
+                        batch.append(self._rx_queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                self._handle_notifications(batch)
             except Exception as e:
-                self.latest_data = data
-            logger.info(f"Notification: {data} {data.hex(':')}")
+                logger.error(f"Error in notification processor: {e}")
+
+    def _handle_notifications(self, batch):
+        """Décode un lot de notifications BLE, dans leur ordre d'arrivée"""
+        temperatures_updated = False
+        for data in batch:
+            if self.update_temperatures(data) is not None:
+                temperatures_updated = True
+                continue
+            self._latest_raw = data
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Notification: %s %s", data, data.hex(':'))
+        if temperatures_updated:
+            logger.info("Temperatures updated: ET: %s BT: %s", self.environment_temperature, self.bean_temperature)
 
     async def process_command(self, command):
         """Traite une commande unique"""
@@ -160,38 +261,49 @@ class RoasterController:
                 self._preheat_task = asyncio.create_task(self.start_preheat(target_temp, **kwargs))
             elif command == "PREHEAT_STOP":
                 self._cancel_preheat()
-            elif isinstance(command, (bytes, bytearray)):
-                await self.client.write_gatt_char(
-                    ROASTER_CHARACTERISTIC_UUID,
-                    command,
-                    response=False
-                )
-            elif self.has_numbers(command):
-                parameter, *values = command.split(" ")
-                await self.send_command(parameter, *values)
             else:
-                await self.send_command(command)
+                await self._write(self.encode_command(command))
 
     async def command_processor(self):
         """Traite les commandes de la queue et les envoie au périphérique BLE"""
         while self.running:
             try:
-                command = await asyncio.wait_for(self.command_queue.get(), timeout=0.1)
-                await self.process_command(command)
-            except asyncio.TimeoutError:
-                continue
+                # Regrouper toutes les commandes déjà en attente dans un seul lot
+                batch = [await self.command_queue.get()]
+                while True:
+                    try:
+                        batch.append(self.command_queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                try:
+                    await self.send_batch(batch)
+                finally:
+                    for _ in batch:
+                        self.command_queue.task_done()
             except Exception as e:
                 logger.error(f"Error in command processor: {e}")
 
+    def _put_threadsafe(self, queue: asyncio.Queue, item):
+        """Dépose un élément dans une queue asyncio, y compris depuis un autre thread"""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if self._loop is None or running_loop is self._loop:
+            queue.put_nowait(item)
+        else:
+            self._loop.call_soon_threadsafe(queue.put_nowait, item)
+
     def add_command(self, command: str):
         """Ajoute une commande à la queue"""
         if command.upper() == "EXIT":
             self._cancel_preheat()
             self.running = False
-            self.command_queue.put_nowait(HSTOP)
+            self._put_threadsafe(self.command_queue, HSTOP)
         else:
             if command.upper() == "COOLING":
                 self.bean_temperature = None
+                self.temperature_version += 1
             if command.upper().startswith("PREHEAT"):
                 parts = command.split()
                 if len(parts) >= 2:
@@ -199,9 +311,9 @@ class RoasterController:
                     soak_duration = int(parts[2]) if len(parts) >= 3 else None
                     tolerance = int(parts[3]) if len(parts) >= 4 else None
                     timeout = int(parts[4]) if len(parts) >= 5 else None
-                    self.command_queue.put_nowait(("PREHEAT", target_temp, soak_duration, tolerance, timeout))
+                    self._put_threadsafe(self.command_queue, ("PREHEAT", target_temp, soak_duration, tolerance, timeout))
                     return
-            self.command_queue.put_nowait(command)
+            self._put_threadsafe(self.command_queue, command)
 
 
 
@@ -225,6 +337,7 @@ class RoasterController:
         self.preheat_target = target_temp
         self.preheat_done.clear()
         self.bean_temperature = None
+        self.temperature_version += 1
 
         logger.info(f"Préchauffage: cible={target_temp}°, timeout={timeout}s")
         await self.send_command("HPSTART", (str(timeout), str(target_temp)))
@@ -268,31 +381,98 @@ class RoasterController:
         self.preheat_target = None
         return True
 
-    async def connect(self, device):
-        """Établit la connexion avec le périphérique BLE"""
+    async def connect(self, device, timeout: Optional[float] = None):
+        """Établit la connexion avec le périphérique BLE (BLEDevice ou adresse)"""
         try:
-            self.client = BleakClient(device)
+            if timeout is None:
+                self.client = BleakClient(device)
+            else:
+                self.client = BleakClient(device, timeout=timeout)
             await self.client.connect()
             logger.info("Connected to device")
+            # Résolue une seule fois plutôt qu'à chaque écriture
+            self._write_char = self.client.services.get_characteristic(ROASTER_CHARACTERISTIC_UUID)
+            await self._negotiate_mtu()
+            self._request_fast_connection_interval()
             callback = self.notification_callback or self.notification_handler
             await self.client.start_notify(NOTIFY_UUID, callback)
             return self.client.is_connected
         except Exception as e:
             logger.error(f"Failed to connect: {e}")
+            # Un échec après client.connect() laisserait le lien ouvert : le
+            # périphérique cesserait d'émettre et serait introuvable au scan
+            if self.client and self.client.is_connected:
+                try:
+                    await self.client.disconnect()
+                except Exception as e:
+                    logger.debug(f"Could not disconnect after failed connect: {e}")
+            self._write_char = None
+            self._mtu = None
             return False
 
+    async def _negotiate_mtu(self):
+        """Récupère le MTU négocié pour vérifier que chaque trame tient dans un paquet"""
+        # BlueZ renvoie 23 tant que le MTU n'a pas été acquis explicitement
+        acquire_mtu = getattr(self.client._backend, "_acquire_mtu", None)
+        if acquire_mtu is not None:
+            try:
+                await acquire_mtu()
+            except Exception as e:
+                logger.debug(f"Could not acquire MTU: {e}")
+        self._mtu = self.client.mtu_size
+        logger.info(f"MTU: {self._mtu}")
+
+    def _request_fast_connection_interval(self):
+        """Demande un intervalle de connexion BLE court pour réduire la latence.
+
+        Seul WinRT expose cette demande ; BlueZ et CoreBluetooth ne permettent
+        pas de choisir les paramètres de connexion depuis l'application.
+        """
+        if sys.platform != "win32":
+            return
+        try:
+            from winrt.windows.devices.bluetooth import BluetoothLEPreferredConnectionParameters
+
+            # La demande reste active tant que l'objet retourné n'est pas fermé
+            self._connection_parameters_request = (
+                self.client._backend._requester.request_preferred_connection_parameters(
+                    BluetoothLEPreferredConnectionParameters.throughput_optimized
+                )
+            )
+        except Exception as e:
+            logger.debug(f"Could not request connection parameters: {e}")
+
     async def disconnect(self):
         """Déconnexion propre du périphérique"""
         self.running = False
+        # Aucune écriture en cours ne doit viser le client après la déconnexion
+        self._cancel_tasks()
         if self.client and self.client.is_connected:
-            await self.client.write_gatt_char(
-                ROASTER_CHARACTERISTIC_UUID,
-                HSTOP,
-                response=False
-            )
+            await self._write(HSTOP)
             await self.client.disconnect()
+        # Après HSTOP : un échec de close() ne doit pas empêcher l'arrêt du torréfacteur
+        if self._connection_parameters_request is not None:
+            try:
+                self._connection_parameters_request.close()
+            except Exception as e:
+                logger.debug(f"Could not release connection parameters: {e}")
+            self._connection_parameters_request = None
+        self._write_char = None
+        self._mtu = None
 
     async def start(self):
         """Démarre le processeur de commandes"""
-        processor_task = asyncio.create_task(self.command_processor())
-        await processor_task
\ No newline at end of file
+        self._loop = asyncio.get_running_loop()
+        self._rx_task = asyncio.create_task(self._rx_processor())
+        self._processor_task = asyncio.create_task(self.command_processor())
+        try:
+            # wait() ne propage pas l'annulation du processeur par disconnect()
+            await asyncio.wait([self._processor_task])
+        finally:
+            self._cancel_tasks()
+
+    def _cancel_tasks(self):
+        """Annule les tâches de traitement des commandes et des notifications"""
+        for task in (self._processor_task, self._rx_task):
+            if task and not task.done():
+                task.cancel()
\ No newline at end of file
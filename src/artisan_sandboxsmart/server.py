@@ -1,8 +1,8 @@
 import asyncio
-import json
 import logging
 import argparse
 
+import orjson
 import websockets
 from bleak import BleakScanner
 
@@ -11,6 +11,10 @@ from artisan_sandboxsmart.controller import RoasterController
 
 logger = logging.getLogger(__name__)
 
+# Réponses constantes, sérialisées une seule fois
+_SUCCESS_JSON = orjson.dumps({"success": True}).decode()
+_INVALID_JSON = orjson.dumps({"error": "Invalid JSON"}).decode()
+
 class RoasterWebSocketServer:
     def __init__(self, host: str = "localhost", port: int = 8765):
         self.host = host
@@ -29,6 +33,7 @@ class RoasterWebSocketServer:
             "id": 0,
         }
         self.running = False
+        self._status_version = -1
         self._notification_queue = asyncio.Queue()
         self._websocket_message_queue = asyncio.Queue()  # Nouvelle queue pour les messages WebSocket
 
@@ -44,6 +49,19 @@ class RoasterWebSocketServer:
             return [self.convert_data_for_json(item) for item in data]
         return data
 
+    def _refresh_status_data(self):
+        """Recopie les températures du controller, seulement si elles ont changé"""
+        version = self.controller.temperature_version
+        if version == self._status_version:
+            return
+        self.current_status["data"].update({
+            "ET": self.controller.environment_temperature,
+            "BT": self.controller.bean_temperature,
+            "ET_ror": self.controller.et_ror,
+            "BT_ror": self.controller.bt_ror,
+        })
+        self._status_version = version
+
     async def handle_ble_notification(self, sender, data):
         """Met les notifications BLE dans une queue au lieu de les traiter directement"""
         await self._notification_queue.put((sender, data))
@@ -53,57 +71,63 @@ class RoasterWebSocketServer:
         while self.running:
             try:
                 sender, data = await self._notification_queue.get()
-                converted_data = self.convert_data_for_json(data)
+                # Les trames BLE sont toujours des octets bruts, jamais des structures imbriquées
+                converted_data = list(data)
                 # Mettre à jour les températures dans le controller
                 self.controller.update_temperatures(data)
-                self.current_status["data"].update({
-                    "ET": self.controller.environment_temperature,
-                    "BT": self.controller.bean_temperature,
-                    "ET_ror": self.controller.et_ror,
-                    "BT_ror": self.controller.bt_ror,
-                })
-                self.current_status["data"]["status"] = converted_data                    
+                self._refresh_status_data()
+                self.current_status["data"]["status"] = converted_data
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Erreur lors du traitement de la notification: {e}")
 
     async def process_websocket_messages(self):
-        """Traite les messages WebSocket depuis la queue"""
+        """Traite les messages WebSocket depuis la queue, par lots"""
         while self.running:
             try:
-                ws_client, message = await self._websocket_message_queue.get()
-                try:
-                    json_message = json.loads(message)
-                    logger.info(f"Nouveau message reçu: {json_message}")
-                    
-                    self.current_status["data"].update({
-                        "ET": self.controller.environment_temperature,
-                        "BT": self.controller.bean_temperature,
-                        "ET_ror": self.controller.et_ror,
-                        "BT_ror": self.controller.bt_ror,
-                    })
-
-                    response = self.current_status
-
-                    if "id" in json_message:
-                        response["id"] = json_message["id"]
-                    if "command" in json_message:
-                        response["last_command"] = json_message["command"]
-                        await ws_client.send(json.dumps(response))
-                    if "pushMessage" in json_message:
-                        if self.controller:
-                            response["last_command"] = json_message["pushMessage"]
-                            self.controller.add_command(json_message["pushMessage"])
-                            await ws_client.send(json.dumps({"success": True}))
-                    logger.info(f"Reponse: {response}")
-                except json.JSONDecodeError:
-                    await ws_client.send(json.dumps({"error": "Invalid JSON"}))
+                batch = [await self._websocket_message_queue.get()]
+                while True:
+                    try:
+                        batch.append(self._websocket_message_queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+
+                # Une réponse par message : Artisan associe chaque réponse à l'id de sa requête
+                for ws_client, message in batch:
+                    try:
+                        await self._handle_websocket_message(ws_client, message)
+                    except Exception as e:
+                        logger.error(f"Erreur lors du traitement du message WebSocket: {e}")
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Erreur lors du traitement du message WebSocket: {e}")
 
+    async def _handle_websocket_message(self, ws_client, message):
+        """Répond à un message WebSocket"""
+        # Un pushMessage précédent du lot (ex. COOLING) peut avoir changé les températures
+        self._refresh_status_data()
+        try:
+            json_message = orjson.loads(message)
+            logger.info(f"Nouveau message reçu: {json_message}")
+
+            response = self.current_status
+
+            if "id" in json_message:
+                response["id"] = json_message["id"]
+            if "command" in json_message:
+                response["last_command"] = json_message["command"]
+                await ws_client.send(orjson.dumps(response).decode())
+            if "pushMessage" in json_message:
+                if self.controller:
+                    response["last_command"] = json_message["pushMessage"]
+                    self.controller.add_command(json_message["pushMessage"])
+                    await ws_client.send(_SUCCESS_JSON)
+            logger.info(f"Reponse: {response}")
+        except orjson.JSONDecodeError:
+            await ws_client.send(_INVALID_JSON)
+
     async def register(self, websocket):
         self.clients.add(websocket)
         logger.info(f"Client connecté. Nombre de clients: {len(self.clients)}")
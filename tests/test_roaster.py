@@ -1,16 +1,23 @@
-"""Unit tests for RoasterController, RoasterWebSocketServer, and WebSocketRoasterCLI."""
+"""Unit tests for RoasterController, RoasterCLI, RoasterWebSocketServer, and WebSocketRoasterCLI."""
 
 import unittest
-from unittest.mock import patch, AsyncMock, call
+from unittest.mock import patch, AsyncMock, MagicMock, call
+import argparse
 import asyncio
+import threading
 import json
+import os
+import tempfile
+
+import orjson
 
 from bleak.backends.device import BLEDevice
 
 from artisan_sandboxsmart.controller import RoasterController
+from artisan_sandboxsmart.cli import RoasterCLI, load_last_device, save_last_device, main
 from artisan_sandboxsmart.server import RoasterWebSocketServer
 from artisan_sandboxsmart.cli_ws import WebSocketRoasterCLI
-from artisan_sandboxsmart.config import HSTOP
+from artisan_sandboxsmart.config import HSTOP, CACHED_CONNECT_TIMEOUT
 
 
 def async_test(coro):
@@ -52,12 +59,24 @@ class TestRoasterController(unittest.TestCase):
         self.assertEqual(temp, 50)
         self.assertEqual(self.controller.environment_temperature, 50)
 
+    def test_update_temperatures_ht(self):
+        # Test HT frame, temperature directly after the prefix
+        data = bytearray.fromhex('4854006e')  # HT with temp 110 (0x6e)
+        temp = self.controller.update_temperatures(data)
+        self.assertEqual(temp, 110)
+        self.assertEqual(self.controller.environment_temperature, 110)
+
     def test_update_temperatures_invalid_data(self):
         # Test invalid data format
         data = bytearray.fromhex('0000')
         temp = self.controller.update_temperatures(data)
         self.assertIsNone(temp)
 
+        # Trame tronquée avec un préfixe connu
+        data = bytearray.fromhex('505400')
+        temp = self.controller.update_temperatures(data)
+        self.assertIsNone(temp)
+
     def test_et_ror_first_reading_is_none(self):
         data = bytearray.fromhex('50540000007800')  # PT temp=120
         self.controller.update_temperatures(data)
@@ -124,6 +143,155 @@ class TestRoasterController(unittest.TestCase):
         self.assertEqual(self.controller.command_queue.get_nowait(), "DRAW 80")
 
 
+    @async_test
+    async def test_add_command_from_other_thread(self):
+        mock_client = AsyncMock()
+        mock_client.is_connected = True
+        self.controller.client = mock_client
+
+        start_task = asyncio.create_task(self.controller.start())
+        await asyncio.sleep(0)
+
+        # Le menu CLI et le serveur appellent add_command depuis la boucle ; une application
+        # qui embarque le contrôleur peut l'appeler depuis un autre thread (call_soon_threadsafe)
+        thread = threading.Thread(target=self.controller.add_command, args=("HEAT 50",))
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.01)
+        mock_client.write_gatt_char.assert_called_with(
+            "0000ffa0-0000-1000-8000-00805f9b34fb",
+            b'HEAT2',
+            response=False
+        )
+
+        thread = threading.Thread(target=self.controller.add_command, args=("EXIT",))
+        thread.start()
+        thread.join()
+        await asyncio.wait_for(start_task, timeout=1)
+        mock_client.write_gatt_char.assert_called_with(
+            "0000ffa0-0000-1000-8000-00805f9b34fb",
+            HSTOP,
+            response=False
+        )
+
+    @async_test
+    async def test_disconnect_sends_hstop_when_release_fails(self):
+        mock_client = AsyncMock()
+        mock_client.is_connected = True
+        self.controller.client = mock_client
+        self.controller._connection_parameters_request = MagicMock()
+        self.controller._connection_parameters_request.close.side_effect = OSError("close failed")
+
+        await self.controller.disconnect()
+
+        mock_client.write_gatt_char.assert_called_once_with(
+            "0000ffa0-0000-1000-8000-00805f9b34fb",
+            HSTOP,
+            response=False
+        )
+        mock_client.disconnect.assert_awaited_once()
+        self.assertIsNone(self.controller._connection_parameters_request)
+
+    @async_test
+    async def test_disconnect_cancels_processor(self):
+        async def write_gatt_char(char, payload, response):
+            if payload != HSTOP:
+                # Écriture BLE bloquée
+                await asyncio.Event().wait()
+
+        mock_client = AsyncMock()
+        mock_client.is_connected = True
+        mock_client.write_gatt_char.side_effect = write_gatt_char
+        self.controller.client = mock_client
+
+        start_task = asyncio.create_task(self.controller.start())
+        self.controller.add_command("HEAT 50")
+        await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(self.controller.disconnect(), timeout=1)
+        await asyncio.wait_for(start_task, timeout=1)
+        self.assertTrue(self.controller._processor_task.cancelled())
+        mock_client.write_gatt_char.assert_called_with(
+            "0000ffa0-0000-1000-8000-00805f9b34fb",
+            HSTOP,
+            response=False
+        )
+        mock_client.disconnect.assert_awaited_once()
+
+    @async_test
+    async def test_command_queue_join(self):
+        mock_client = AsyncMock()
+        mock_client.is_connected = True
+        self.controller.client = mock_client
+
+        processor = asyncio.create_task(self.controller.command_processor())
+        self.controller.add_command("HEAT 50")
+        self.controller.add_command("DRUM 75")
+        # join() rend la main une fois toutes les commandes envoyées
+        await asyncio.wait_for(self.controller.command_queue.join(), timeout=1)
+        self.assertEqual(mock_client.write_gatt_char.call_count, 2)
+
+        processor.cancel()
+        try:
+            await processor
+        except asyncio.CancelledError:
+            pass
+
+    @async_test
+    async def test_notification_handler_defers_parsing(self):
+        data = bytearray.fromhex('50540000007800')  # PT temp=120
+        await self.controller.notification_handler(None, data)
+        # Le décodage n'a pas lieu dans le callback BLE
+        self.assertIsNone(self.controller.environment_temperature)
+
+        rx_task = asyncio.create_task(self.controller._rx_processor())
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.controller.environment_temperature, 120)
+
+        rx_task.cancel()
+        try:
+            await rx_task
+        except asyncio.CancelledError:
+            pass
+
+    def test_handle_notifications_batch(self):
+        with patch('time.monotonic', side_effect=[0.0, 30.0]):
+            self.controller._handle_notifications([
+                bytes.fromhex('50540000007800'),  # PT temp=120
+                b'OK',
+                bytes.fromhex('50540000009600'),  # PT temp=150
+            ])
+        # Toutes les trames du lot sont prises en compte, dans l'ordre
+        self.assertEqual(self.controller.environment_temperature, 150)
+        self.assertEqual(self.controller.et_ror, 60.0)
+        self.assertEqual(self.controller.latest_data, "OK")
+
+    def test_build_command_is_cached(self):
+        first = self.controller.build_command("HEAT", "50")
+        self.assertEqual(first, b'HEAT2')
+        # Une commande déjà encodée est réutilisée telle quelle
+        self.assertIs(self.controller.build_command("HEAT", "50"), first)
+        self.assertEqual(self.controller.build_command("HPSTART", ("1200", "200")), b'HPSTART\x04\xb0\x00\xc8')
+
+    def test_build_command_negative_value_dropped(self):
+        # Une valeur négative reste numérique : hors limites, elle est ignorée
+        self.assertEqual(self.controller.build_command("HEAT", "-5"), b'HEAT')
+        self.assertEqual(self.controller.build_command("LIGHT", "ON"), b'LIGHT ON')
+
+    def test_encode_command_ignores_extra_spaces(self):
+        # Même normalisation que send_command pour les commandes de la queue
+        self.assertEqual(self.controller.encode_command("HEAT  50"), b'HEAT2')
+        self.assertEqual(self.controller.encode_command(" HPSTART 1200  200 "), b'HPSTART\x04\xb0\x00\xc8')
+
+    def test_latest_data_decoded_on_access(self):
+        self.assertEqual(self.controller.latest_data, {})
+
+        self.controller._handle_notifications([b'OK'])
+        self.assertEqual(self.controller.latest_data, "OK")
+
+        self.controller._handle_notifications([b'\xff\xfe'])
+        self.assertEqual(self.controller.latest_data, b'\xff\xfe')
+
     @async_test
     async def test_send_command(self):
         # Create a mock BLEDevice
@@ -164,6 +332,14 @@ class TestRoasterController(unittest.TestCase):
                 response=False
             )
 
+            # Test command with a text value
+            await self.controller.send_command("LIGHT", "ON")
+            mock_client.write_gatt_char.assert_called_with(
+                "0000ffa0-0000-1000-8000-00805f9b34fb",
+                b'LIGHT ON',
+                response=False
+            )
+
     def test_add_command_preheat(self):
         # Test PREHEAT avec température seule
         self.controller.add_command("PREHEAT 200")
@@ -201,6 +377,15 @@ class TestRoasterController(unittest.TestCase):
         self.controller.update_temperatures(data)
         self.assertTrue(self.controller.preheat_done.is_set())
 
+    def test_update_temperatures_zero_reading_during_preheat(self):
+        self.controller.preheat_target = 200
+
+        # Lecture nulle avant toute température connue : pas d'erreur ni de signal
+        data = bytearray.fromhex('50540000000000')
+        self.assertEqual(self.controller.update_temperatures(data), 0)
+        self.assertIsNone(self.controller.environment_temperature)
+        self.assertFalse(self.controller.preheat_done.is_set())
+
     @async_test
     async def test_start_preheat_success(self):
         mock_client = AsyncMock()
@@ -250,6 +435,64 @@ class TestRoasterController(unittest.TestCase):
         self.assertFalse(result)
         self.assertIsNone(self.controller.preheat_target)
 
+    @async_test
+    async def test_connect_caches_write_characteristic(self):
+        with patch('artisan_sandboxsmart.controller.BleakClient') as mock_client_class:
+            mock_client = AsyncMock()
+            mock_client.is_connected = True
+            write_char = object()
+            mock_client.services.get_characteristic = lambda uuid: write_char
+            mock_client.mtu_size = 247
+            mock_client_class.return_value = mock_client
+
+            self.assertTrue(await self.controller.connect("11:22:33:44:55:66"))
+            self.assertEqual(self.controller._mtu, 247)
+            await self.controller.send_command("HSTOP")
+            mock_client.write_gatt_char.assert_called_with(write_char, b'HSTOP', response=False)
+
+    def _recording_client(self, fail_on=()):
+        """Client BLE simulé qui rend la main à chaque écriture et note l'ordre des trames"""
+        written = []
+
+        async def write_gatt_char(char, payload, response):
+            await asyncio.sleep(0)
+            if payload in fail_on:
+                raise OSError("write failed")
+            written.append(bytes(payload))
+
+        mock_client = AsyncMock()
+        mock_client.is_connected = True
+        mock_client.write_gatt_char.side_effect = write_gatt_char
+        self.controller.client = mock_client
+        return written
+
+    @async_test
+    async def test_send_batch_preserves_order(self):
+        written = self._recording_client()
+
+        with patch.object(self.controller, '_cancel_preheat') as mock_cancel:
+            await self.controller.send_batch(["HEAT 50", "DRUM 75", "PREHEAT_STOP", "DRAW 20", HSTOP])
+            mock_cancel.assert_called_once()
+
+        self.assertEqual(written, [b'HEAT2', b'DRUMK', b'DRAW\x14', b'HSTOP'])
+
+    @async_test
+    async def test_send_batch_skips_invalid_command(self):
+        written = self._recording_client()
+
+        await self.controller.send_batch(["HEAT 50", "HPSTART 1200 abc", "DRUM 50", HSTOP])
+
+        # La commande invalide est ignorée, le reste du lot (dont HSTOP) est envoyé
+        self.assertEqual(written, [b'HEAT2', b'DRUM2', b'HSTOP'])
+
+    @async_test
+    async def test_send_batch_failed_write_does_not_cancel_batch(self):
+        written = self._recording_client(fail_on=(b'DRUM2',))
+
+        await self.controller.send_batch(["HEAT 50", "DRUM 50", HSTOP])
+
+        self.assertEqual(written, [b'HEAT2', b'HSTOP'])
+
     @async_test
     async def test_process_command_preheat_tuple(self):
         mock_client = AsyncMock()
@@ -261,11 +504,127 @@ class TestRoasterController(unittest.TestCase):
             mock_preheat.assert_called_once_with(200, soak_duration=1200)
 
 
+class TestRoasterCLI(unittest.TestCase):
+    @async_test
+    async def test_menu_loop_queues_commands(self):
+        controller = RoasterController()
+        cli = RoasterCLI(controller)
+        with patch('builtins.print'):
+            with patch('aioconsole.ainput', new_callable=AsyncMock, side_effect=['HEAT 50', 'EXIT']):
+                await asyncio.wait_for(cli.menu_loop(), timeout=1)
+
+        self.assertFalse(controller.running)
+        self.assertEqual(controller.command_queue.get_nowait(), "HEAT 50")
+        self.assertEqual(controller.command_queue.get_nowait(), HSTOP)
+
+    def test_last_device_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "last.json")
+            self.assertIsNone(load_last_device(path))
+
+            save_last_device("Sandbox", "11:22:33:44:55:66", path)
+            self.assertEqual(
+                load_last_device(path),
+                {"name": "Sandbox", "address": "11:22:33:44:55:66"}
+            )
+
+    def test_last_device_corrupted_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "last.json")
+            with open(path, "w") as f:
+                f.write("not json")
+            self.assertIsNone(load_last_device(path))
+
+    def test_last_device_unexpected_shape(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "last.json")
+            for content in ('{"name": "Sandbox"}', '{"address": 42}', '["11:22:33:44:55:66"]', 'null'):
+                with open(path, "w") as f:
+                    f.write(content)
+                self.assertIsNone(load_last_device(path))
+
+    @async_test
+    async def test_main_disconnects_failed_cached_connect_before_scan(self):
+        args = argparse.Namespace(name="Sandbox", address=None, macos_use_bdaddr=False)
+        device = BLEDevice("11:22:33:44:55:66", "Sandbox", {})
+        events = []
+
+        cached_client = AsyncMock()
+        cached_client.is_connected = True
+        cached_client.mtu_size = 247
+        cached_client.services = MagicMock()
+        # La connexion aboutit mais l'abonnement aux notifications échoue
+        cached_client.start_notify.side_effect = OSError("start_notify failed")
+
+        async def disconnect_cached():
+            events.append("disconnect")
+            cached_client.is_connected = False
+        cached_client.disconnect.side_effect = disconnect_cached
+
+        scanned_client = AsyncMock()
+        scanned_client.is_connected = True
+        scanned_client.mtu_size = 247
+        scanned_client.services = MagicMock()
+
+        async def scan(*args, **kwargs):
+            events.append("scan")
+            return device
+
+        menu = MagicMock()
+        menu.stop_menu = AsyncMock()
+
+        with patch('artisan_sandboxsmart.controller.BleakClient', side_effect=[cached_client, scanned_client]), \
+             patch('artisan_sandboxsmart.controller.RoasterController.start', new_callable=AsyncMock), \
+             patch('artisan_sandboxsmart.cli.RoasterCLI', return_value=menu), \
+             patch('artisan_sandboxsmart.cli.load_last_device',
+                   return_value={"name": "Sandbox", "address": "AA:BB:CC:DD:EE:FF"}), \
+             patch('artisan_sandboxsmart.cli.save_last_device'), \
+             patch('artisan_sandboxsmart.cli.BleakScanner.find_device_by_name', side_effect=scan):
+            await main(args)
+
+        # Le lien ouvert par la tentative directe est fermé avant le scan
+        self.assertEqual(events, ["disconnect", "scan"])
+        scanned_client.start_notify.assert_awaited_once()
+
+    @async_test
+    async def test_main_falls_back_to_scan(self):
+        args = argparse.Namespace(name="Sandbox", address=None, macos_use_bdaddr=False)
+        device = BLEDevice("11:22:33:44:55:66", "Sandbox", {})
+        controller = MagicMock()
+        # La connexion directe échoue, celle après le scan réussit
+        controller.connect = AsyncMock(side_effect=[False, True])
+        controller.start = AsyncMock()
+        controller.disconnect = AsyncMock()
+        menu = MagicMock()
+        menu.stop_menu = AsyncMock()
+
+        with patch('artisan_sandboxsmart.cli.RoasterController', return_value=controller), \
+             patch('artisan_sandboxsmart.cli.RoasterCLI', return_value=menu), \
+             patch('artisan_sandboxsmart.cli.load_last_device',
+                   return_value={"name": "Sandbox", "address": "AA:BB:CC:DD:EE:FF"}), \
+             patch('artisan_sandboxsmart.cli.save_last_device') as mock_save, \
+             patch('artisan_sandboxsmart.cli.BleakScanner.find_device_by_name',
+                   new_callable=AsyncMock, return_value=device) as mock_scan:
+            await main(args)
+
+        self.assertEqual(controller.connect.await_args_list, [
+            call("AA:BB:CC:DD:EE:FF", timeout=CACHED_CONNECT_TIMEOUT),
+            call(device),
+        ])
+        mock_scan.assert_awaited_once()
+        mock_save.assert_called_once_with("Sandbox", "11:22:33:44:55:66")
+        controller.start.assert_awaited_once()
+
+
 class TestRoasterWebSocketServer(unittest.TestCase):
     def setUp(self):
         self.server = RoasterWebSocketServer()
         
     def test_convert_data_for_json(self):
+        # Test scalar values are returned unchanged
+        for value in (None, 42, 21.5, "text"):
+            self.assertEqual(self.server.convert_data_for_json(value), value)
+
         # Test bytearray conversion
         data = bytearray([1, 2, 3])
         result = self.server.convert_data_for_json(data)
@@ -298,6 +657,27 @@ class TestRoasterWebSocketServer(unittest.TestCase):
         self.assertEqual(len(self.server.clients), 0)
         self.assertNotIn(mock_websocket, self.server.clients)
 
+    @async_test
+    async def test_process_notifications(self):
+        self.server.running = True
+        self.server.controller = RoasterController()
+
+        data = bytearray.fromhex('50540000007800')  # PT temp=120
+        await self.server.handle_ble_notification(None, data)
+
+        task = asyncio.create_task(self.server.process_notifications())
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(self.server.current_status["data"]["ET"], 120)
+        self.assertEqual(self.server.current_status["data"]["status"], list(data))
+
+        self.server.running = False
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
     @async_test
     async def test_process_websocket_messages(self):
         self.server.running = True
@@ -325,32 +705,169 @@ class TestRoasterWebSocketServer(unittest.TestCase):
             pass
 
 
+    @async_test
+    async def test_process_websocket_messages_batch(self):
+        self.server.running = True
+        self.server.controller = RoasterController()
+
+        mock_websocket = AsyncMock()
+        for message in ("not json", json.dumps({"pushMessage": "HEAT 50"})):
+            await self.server._websocket_message_queue.put((mock_websocket, message))
+
+        task = asyncio.create_task(self.server.process_websocket_messages())
+        await asyncio.sleep(0.1)
+
+        # Un message invalide n'empêche pas le traitement du reste du lot
+        mock_websocket.send.assert_has_calls([
+            call(json.dumps({"error": "Invalid JSON"}, separators=(",", ":"))),
+            call(json.dumps({"success": True}, separators=(",", ":"))),
+        ])
+        self.assertEqual(self.server.controller.command_queue.get_nowait(), "HEAT 50")
+
+        self.server.running = False
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    @async_test
+    async def test_process_websocket_messages_batch_refreshes_status(self):
+        self.server.running = True
+        self.server.controller = RoasterController()
+        self.server.controller.bean_temperature = 150
+        self.server.controller.temperature_version += 1
+
+        mock_websocket = AsyncMock()
+        for message in (json.dumps({"pushMessage": "COOLING"}), json.dumps({"command": "getData"})):
+            await self.server._websocket_message_queue.put((mock_websocket, message))
+
+        task = asyncio.create_task(self.server.process_websocket_messages())
+        await asyncio.sleep(0.1)
+
+        # getData voit la BT remise à zéro par le COOLING du même lot
+        (payload,), _ = mock_websocket.send.call_args
+        self.assertIsNone(json.loads(payload)["data"]["BT"])
+
+        self.server.running = False
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def test_refresh_status_data_only_on_new_version(self):
+        self.server.controller = RoasterController()
+        self.server.controller.update_temperatures(bytearray.fromhex('50540000007800'))  # PT temp=120
+        self.server._refresh_status_data()
+        self.assertEqual(self.server.current_status["data"]["ET"], 120)
+
+        # Sans nouvelle version, le statut n'est pas recopié
+        self.server.current_status["data"]["ET"] = None
+        self.server._refresh_status_data()
+        self.assertIsNone(self.server.current_status["data"]["ET"])
+
+        self.server.controller.update_temperatures(bytearray.fromhex('50540000009600'))  # PT temp=150
+        self.server._refresh_status_data()
+        self.assertEqual(self.server.current_status["data"]["ET"], 150)
+
+    def test_temperature_version_unchanged_for_same_reading(self):
+        controller = RoasterController()
+        with patch('time.monotonic', return_value=0.0):
+            controller.update_temperatures(bytearray.fromhex('50540000007800'))  # PT 120
+        with patch('time.monotonic', return_value=30.0):
+            controller.update_temperatures(bytearray.fromhex('50540000007800'))  # PT 120, RoR 0
+        version = controller.temperature_version
+
+        # Même ET et même RoR : rien à recopier dans le statut du serveur
+        with patch('time.monotonic', return_value=60.0):
+            controller.update_temperatures(bytearray.fromhex('50540000007800'))
+        self.assertEqual(controller.temperature_version, version)
+
+        with patch('time.monotonic', return_value=90.0):
+            controller.update_temperatures(bytearray.fromhex('50540000009600'))  # PT 150
+        self.assertEqual(controller.temperature_version, version + 1)
+
+    @async_test
+    async def test_process_websocket_messages_command_response(self):
+        self.server.running = True
+        self.server.controller = RoasterController()
+        self.server.controller.environment_temperature = 180
+
+        mock_websocket = AsyncMock()
+        await self.server._websocket_message_queue.put(
+            (mock_websocket, json.dumps({"command": "getData", "id": 7}))
+        )
+
+        task = asyncio.create_task(self.server.process_websocket_messages())
+        await asyncio.sleep(0.1)
+
+        # Les réponses restent des trames texte pour Artisan
+        (payload,), _ = mock_websocket.send.call_args
+        self.assertIsInstance(payload, str)
+        response = json.loads(payload)
+        self.assertEqual(response["id"], 7)
+        self.assertEqual(response["last_command"], "getData")
+        self.assertEqual(response["data"]["ET"], 180)
+
+        self.server.running = False
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
 class TestWebSocketRoasterCLI(unittest.TestCase):
-    def test_print_menu(self):
-        with patch('builtins.input', return_value='EXIT'):
+    @async_test
+    async def test_print_menu(self):
+        with patch('aioconsole.ainput', new_callable=AsyncMock, return_value='EXIT'):
             cli = WebSocketRoasterCLI("ws://localhost:8765")
-            choice = cli.print_menu()
+            choice = await cli.print_menu()
             self.assertEqual(choice, 'EXIT')
 
     @async_test
     async def test_run_multiple_commands(self):
+        async def responses():
+            yield json.dumps({"status": "ok"})
+            # Connexion ouverte jusqu'à la sortie de l'utilisateur
+            await asyncio.Event().wait()
+
         with patch('websockets.connect') as mock_ws_connect:
-            with patch('builtins.input', side_effect=['HEAT 50', 'HSTOP', 'EXIT']):
+            with patch('aioconsole.ainput', new_callable=AsyncMock, side_effect=['HEAT 50', 'HSTOP', 'EXIT']):
                 # Setup mock websocket
                 mock_ws = AsyncMock()
+                mock_ws.__aiter__ = lambda self: responses()
                 mock_ws_connect.return_value.__aenter__.return_value = mock_ws
-                mock_ws.recv.return_value = json.dumps({"status": "ok"})
-                
+
                 # Create and run CLI
                 cli = WebSocketRoasterCLI("ws://localhost:8765")
-                await cli.run()
-                
+                with patch('builtins.print') as mock_print:
+                    await asyncio.wait_for(cli.run(), timeout=1)
+
                 # Verify commands were sent
                 expected_calls = [
-                    call(json.dumps({"pushMessage": "HEAT 50"})),
-                    call(json.dumps({"pushMessage": "HSTOP"}))
+                    call(orjson.dumps({"pushMessage": "HEAT 50"})),
+                    call(orjson.dumps({"pushMessage": "HSTOP"}))
                 ]
                 mock_ws.send.assert_has_calls(expected_calls)
+                mock_print.assert_any_call("Server response:", {"status": "ok"})
+
+    @async_test
+    async def test_reader_skips_invalid_frame(self):
+        async def responses():
+            yield "not json"
+            yield json.dumps({"status": "ok"})
+
+        mock_ws = AsyncMock()
+        mock_ws.__aiter__ = lambda self: responses()
+
+        cli = WebSocketRoasterCLI("ws://localhost:8765")
+        with patch('builtins.print') as mock_print:
+            await asyncio.wait_for(cli._reader(mock_ws), timeout=1)
+
+        # La trame invalide est ignorée, la suivante est affichée
+        mock_print.assert_called_once_with("Server response:", {"status": "ok"})
 
 
 if __name__ == '__main__':